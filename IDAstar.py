@@ -1,107 +1,446 @@
+import argparse
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
 import random
 import time
 import csv
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+TT_BITS = 12
+# Integer "infinity" for f values, so bound comparisons stay int-to-int
+INF = 1 << 30
+PERIMETER_RADIUS = 12
+# The solver is specialised for the 3x3 board: cells are numbered 0..8 row by row, NEIGHBORS[i] lists
+# the cells the blank can move to from cell i, and cell i lives in the 4-bit lane at SHIFTS[i]
+NEIGHBORS = ((1, 3), (0, 2, 4), (1, 5), (0, 4, 6), (1, 3, 5, 7), (2, 4, 8), (3, 7), (4, 6, 8), (5, 7))
+SHIFTS = (0, 4, 8, 12, 16, 20, 24, 28, 32)
+FACTORIALS = (40320, 5040, 720, 120, 24, 6, 2, 1, 1)
+# Tile val in cell i adds i * PATTERN_WEIGHTS[val] to pattern_code: a base-9 number whose low four
+# digits place tiles 1-4 and high four digits place tiles 5-8
+PATTERN_WEIGHTS = (0, 1, 9, 81, 729, 6561, 59049, 531441, 4782969)
+
+
+def pack(grid):
+    return sum(val << SHIFTS[i] for i, val in enumerate(val for row in grid for val in row))
+
+
+def blank_of(state):
+    return next(i for i in range(9) if not (state >> SHIFTS[i]) & 0xF)
+
+
+def swap(state, blank, j):
+    # The state after the tile in cell j slides into the blank at cell `blank`
+    val = (state >> SHIFTS[j]) & 0xF
+    return state ^ (val << SHIFTS[j]) ^ (val << SHIFTS[blank])
+
+
+@functools.lru_cache(maxsize=8)
+def perimeter_around(goal, radius):
+    # Every state within `radius` moves of goal -> its exact distance; shared, so never modify it
+    perimeter = {goal: 0}
+    layer = [(goal, blank_of(goal))]
+    for depth in range(1, radius + 1):
+        next_layer = []
+        for state, blank in layer:
+            for j in NEIGHBORS[blank]:
+                s = swap(state, blank, j)
+                if s not in perimeter:
+                    perimeter[s] = depth
+                    next_layer.append((s, j))
+        layer = next_layer
+    return perimeter
+
+
+def replay(state, blank, blanks):
+    # The states reached by moving the blank from `blank` through each cell of `blanks` in turn
+    states = []
+    for j in blanks:
+        state = swap(state, blank, j)
+        states.append(state)
+        blank = j
+    return states
+
+
+def descend(perimeter, state, blank):
+    # The rest of a shortest path to the goal from a state inside the perimeter
+    path = []
+    while perimeter[state]:
+        for j in NEIGHBORS[blank]:
+            s = swap(state, blank, j)
+            if perimeter.get(s) == perimeter[state] - 1:
+                break
+        path.append(s)
+        state, blank = s, j
+    return path
+
+
+def is_solvable(state, goal):
+    # On a board of odd width no move changes the parity of the tile order read row by row (blank
+    # left out): a horizontal move keeps the order and a vertical one jumps a tile over two others.
+    # So the goal is reachable exactly when the permutation between the two orders is even, which is
+    # read off its cycle count: parity = (n - cycles) % 2.
+    goal_rank = {}
+    for i in range(9):
+        val = (goal >> SHIFTS[i]) & 0xF
+        if val:
+            goal_rank[val] = len(goal_rank)
+    perm = [goal_rank[val] for val in ((state >> shift) & 0xF for shift in SHIFTS) if val]
+    cycles = 0
+    for k in range(len(perm)):
+        if perm[k] >= 0:
+            cycles += 1
+            while perm[k] >= 0:
+                perm[k], k = -1, perm[k]
+    return (len(perm) - cycles) % 2 == 0
+
+
+def lehmer_index(state):
+    # Rank of the tile permutation among all 9! orderings, a perfect hash into the pattern database
+    index = 0
+    seen = 0
+    for i in range(9):
+        val = (state >> SHIFTS[i]) & 0xF
+        index += (val - (seen & ((1 << val) - 1)).bit_count()) * FACTORIALS[i]
+        seen |= 1 << val
+    return index
+
+
+@functools.lru_cache(maxsize=2)
+def pattern_database(goal):
+    # Exact distance to goal by lehmer_index; the unreachable half of the permutations stays 0xFF
+    pdb = bytearray(b'\xff') * FACTORIALS[0] * 9
+    pdb[lehmer_index(goal)] = 0
+    layer = [(goal, blank_of(goal))]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for state, blank in layer:
+            for j in NEIGHBORS[blank]:
+                s = swap(state, blank, j)
+                index = lehmer_index(s)
+                if pdb[index] == 0xFF:
+                    pdb[index] = depth
+                    next_layer.append((s, j))
+        layer = next_layer
+    return bytes(pdb)
+
+
+def pattern_code(state):
+    return sum(i * PATTERN_WEIGHTS[(state >> SHIFTS[i]) & 0xF] for i in range(9))
+
+
+@functools.lru_cache(maxsize=2)
+def additive_pattern_database(goal):
+    # Moving a tile outside the pattern is free, so the two tables never count the same move and
+    # their sum is admissible
+    cell_of = {(goal >> SHIFTS[i]) & 0xF: i for i in range(9)}
+    # placements[code]: the cells of the pattern's four tiles, the base-9 digits of code
+    placements = [cells[::-1] for cells in itertools.product(range(9), repeat=4)]
+    tables = []
+    for tiles in ((1, 2, 3, 4), (5, 6, 7, 8)):
+        # The other tiles are interchangeable, so a node is code * 9 + the blank's cell
+        dist = bytearray(b'\xff') * (6561 * 9)
+        start = sum(cell_of[val] * 9 ** k for k, val in enumerate(tiles)) * 9 + cell_of[0]
+        dist[start] = 0
+        queue = collections.deque([start])
+        while queue:
+            node = queue.popleft()
+            code, blank = divmod(node, 9)
+            d = dist[node]
+            cells = placements[code]
+            for j in NEIGHBORS[blank]:
+                if j in cells:
+                    next_node = (code + (blank - j) * 9 ** cells.index(j)) * 9 + j
+                    if d + 1 < dist[next_node]:
+                        dist[next_node] = d + 1
+                        queue.append(next_node)
+                else:
+                    # Free moves go to the front, so nodes still leave the queue in distance order
+                    next_node = node - blank + j
+                    if d < dist[next_node]:
+                        dist[next_node] = d
+                        queue.appendleft(next_node)
+        tables.append(bytes(min(dist[code * 9:code * 9 + 9]) for code in range(6561)))
+    return tuple(tables)
+
 
 class Puzzle:
     def __init__(self, initial, goal):
-        self.initial = initial[2]
-        self.goal = goal[2]
-        self.size = len(self.initial)
-        self.goal_positions = {val: (r, c) for r, row in enumerate(self.goal) for c, val in enumerate(row)}
-
-    def h_manhattan(self, state):
-        distance = sum(abs(r - self.goal_positions[val][0]) + abs(c - self.goal_positions[val][1])
-                       for r, row in enumerate(state) for c, val in enumerate(row) if val)
-        return distance
-
-    def generate_successors(self, state):
-        zero_row, zero_col = next((r, c) for r, row in enumerate(state) for c, val in enumerate(row) if not val)
-        successors = []
-        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            new_r, new_c = zero_row + dr, zero_col + dc
-            if 0 <= new_r < self.size and 0 <= new_c < self.size:
-                new_state = [list(row) for row in state]
-                new_state[zero_row][zero_col], new_state[new_r][new_c] = new_state[new_r][new_c], new_state[zero_row][zero_col]
-                successors.append(new_state)
-        return successors
+        flat = [val for row in initial[2] for val in row]
+        self.initial = pack(initial[2])
+        self.blank = flat.index(0)
+        self.goal = pack(goal[2])
+        self.solvable = is_solvable(self.initial, self.goal)
+        self.pattern_tables = additive_pattern_database(self.goal)
+
+    def h_additive(self, state):
+        low, high = self.pattern_tables
+        code = pattern_code(state)
+        return low[code % 6561] + high[code // 6561]
+
+    def search(self, path, h, bound, max_depth, deadline, tt, nodes_opened, stop_event=None,
+               perimeter=None, radius=0):
+        # One IDA* pass under bound: returns (smallest pruned f, found, nodes_opened); path gets the solution
+        goal = self.goal
+        shifts = SHIFTS
+        weights = PATTERN_WEIGHTS
+        low, high = self.pattern_tables
+        tt_mask = len(tt) - 1
+
+        # frames[g] = [blank, last_blank, pattern_code, next move to try, smallest f pruned below]
+        nodes_opened += 1
+        if h > bound or time.monotonic() > deadline:
+            return h, False, nodes_opened
+        if path[0] == goal:
+            return 0, True, nodes_opened
+        if perimeter is not None and path[0] in perimeter:
+            path.extend(descend(perimeter, path[0], self.blank))
+            return len(path) - 1, True, nodes_opened
+        state = path[0]
+        # Frames are allocated once, one per depth, and overwritten in place as the search moves
+        frames = [[0, 0, 0, 0, 0] for _ in range(max_depth + 1)]
+        frames[0][:] = self.blank, -1, pattern_code(state), 0, INF
+        top = 0
+        while True:
+            frame = frames[top]
+            blank, last_blank, code, k, min_bound = frame
+            moves = NEIGHBORS[blank]
+            if k == len(moves):
+                if not top:
+                    return min_bound, False, nodes_opened
+                key = state | (last_blank << 36)
+                g = top
+                top -= 1
+                slot = (key ^ (key >> 20)) & tt_mask
+                entry = tt[slot]
+                # On a collision keep whichever entry is shallower: it stands for the larger subtree
+                if not entry or entry >> 24 == key or (entry >> 16) & 0xFF >= g:
+                    tt[slot] = key << 24 | g << 16 | min(min_bound - g, 0xFFFF)
+                val = (state >> shifts[last_blank]) & 0xF
+                state ^= (val << shifts[last_blank]) ^ (val << shifts[blank])
+                if min_bound < frames[top][4]:
+                    frames[top][4] = min_bound
+                continue
+            frame[3] = k + 1
+            s_blank = moves[k]
+            # Moving the blank straight back to last_blank would only undo the previous move
+            if s_blank == last_blank:
+                continue
+            val = (state >> shifts[s_blank]) & 0xF
+            s = state ^ (val << shifts[s_blank]) ^ (val << shifts[blank])
+            # Only the tile that moved changes its digit of the pattern code
+            s_code = code + (blank - s_blank) * weights[val]
+            s_h = low[s_code % 6561] + high[s_code // 6561]
+            g = top + 1
+            nodes_opened += 1
+            if not nodes_opened & 0xFFF and (time.monotonic() > deadline
+                                              or stop_event is not None and stop_event.is_set()):
+                return g + s_h, False, nodes_opened
+            f = g + s_h
+            if perimeter is not None:
+                # Inside the perimeter the distance is exact, so reaching it within the bound meets the
+                # backward search; outside it, the goal is at least radius + 1 moves away
+                dist = perimeter.get(s)
+                if dist is None:
+                    if s_h <= radius:
+                        f = g + radius + 1
+                elif g + dist <= bound and g + dist <= max_depth:
+                    path.extend(replay(path[0], self.blank, [frames[i][0] for i in range(1, g)] + [s_blank]))
+                    path.extend(descend(perimeter, s, s_blank))
+                    return g + dist, True, nodes_opened
+                else:
+                    f = g + dist
+            if f <= bound:
+                key = s | (blank << 36)
+                entry = tt[(key ^ (key >> 20)) & tt_mask]
+                if entry >> 24 == key and g + (entry & 0xFFFF) > bound:
+                    f = g + (entry & 0xFFFF)
+            if f > bound or g > max_depth:
+                if f < min_bound:
+                    frame[4] = min_bound = f
+                continue
+            if s == goal:
+                path.extend(replay(path[0], self.blank, [frames[i][0] for i in range(1, g)] + [s_blank]))
+                return g, True, nodes_opened
+            state = s
+            top = g
+            frame = frames[g]
+            frame[0] = s_blank
+            frame[1] = blank
+            frame[2] = s_code
+            frame[3] = 0
+            frame[4] = INF
 
     def ida_star(self, max_depth=30, timeout_seconds=10):
-        nodes_opened = [0]
-
-        def search(path, g, bound, start_time, nodes_opened):
-            nodes_opened[0] += 1
-            current = path[-1]
-            f = g + self.h_manhattan(current)
-            if f > bound or g > max_depth or datetime.now() - start_time > timedelta(seconds=timeout_seconds):
-                return f, False, nodes_opened[0]
-            if current == self.goal:
-                return g, True, nodes_opened[0]
-            min_bound = float('inf')
-            for s in self.generate_successors(current):
-                if s not in path:
-                    path.append(s)
-                    t, found, nodes_opened_count = search(path, g+1, bound, start_time, nodes_opened)
-                    if found:
-                        return t, True, nodes_opened_count
-                    if t < min_bound:
-                        min_bound = t
-                    path.pop()
-            return min_bound, False, nodes_opened[0]
-
-        start_time = datetime.now()
-        bound = self.h_manhattan(self.initial)
-        path = [self.initial]
+        if not self.solvable:
+            return None, 0
+        nodes_opened = 0
+        # Slots hold key << 24 | g << 16 | smallest failed f - g, with key = state | last_blank << 36
+        tt = [0] * (1 << TT_BITS)
+        deadline = time.monotonic() + timeout_seconds
+        h = self.h_additive(self.initial)
+        bound = h
         while True:
-            t, found, nodes_opened_count = search(path, 0, bound, start_time, nodes_opened)
-            if found or datetime.now() - start_time > timedelta(seconds=timeout_seconds):
-                return path if found else None, nodes_opened_count
+            path = [self.initial]
+            t, found, nodes_opened = self.search(path, h, bound, max_depth, deadline, tt, nodes_opened)
+            if found:
+                return path, nodes_opened
+            # No solution costs less than the smallest pruned f, so past max_depth there is none
+            if t > max_depth or time.monotonic() > deadline:
+                return None, nodes_opened
             bound = t
 
-def solve_puzzle(start_state, goal_state):
-    start_time = time.time()
+    def ida_star_parallel(self, workers=None, max_depth=30, timeout_seconds=10):
+        # h keeps the parity of Manhattan distance, so the bounds step by 2 and can all run at once
+        if not self.solvable:
+            return None, 0
+        h = self.h_additive(self.initial)
+        bounds = range(h, max_depth + 1, 2)
+        deadline = time.monotonic() + timeout_seconds
+        nodes_opened = 0
+        stop_event = multiprocessing.Event()
+        with multiprocessing.Pool(workers, initializer=_init_window_worker, initargs=(stop_event,)) as pool:
+            jobs = [(self, bound, max_depth, deadline) for bound in bounds]
+            for path, nodes in pool.imap(_window_search, jobs):
+                nodes_opened += nodes
+                if path is not None:
+                    stop_event.set()
+                    return path, nodes_opened
+                if time.monotonic() > deadline:
+                    break
+            stop_event.set()
+        return None, nodes_opened
+
+    def ida_star_bidir(self, radius=PERIMETER_RADIUS, max_depth=30, timeout_seconds=10):
+        # Perimeter search: IDA* forward from the start until it meets a BFS ball around the goal
+        if not self.solvable:
+            return None, 0
+        nodes_opened = 0
+        tt = [0] * (1 << TT_BITS)
+        deadline = time.monotonic() + timeout_seconds
+        perimeter = perimeter_around(self.goal, radius)
+        h = self.h_additive(self.initial)
+        bound = h if self.initial in perimeter else max(h, radius + 1)
+        while True:
+            path = [self.initial]
+            t, found, nodes_opened = self.search(path, h, bound, max_depth, deadline, tt, nodes_opened,
+                                                 perimeter=perimeter, radius=radius)
+            if found:
+                return path, nodes_opened
+            if t > max_depth or time.monotonic() > deadline:
+                return None, nodes_opened
+            bound = t
+
+    def ida_star_pdb(self, max_depth=30):
+        # With exact distances no search is needed: each step goes one move closer to the goal
+        pdb = pattern_database(self.goal)
+        state, blank = self.initial, self.blank
+        dist = pdb[lehmer_index(state)]
+        if dist > max_depth:
+            return None, 0
+        path = [state]
+        nodes_opened = 1
+        while dist:
+            for j in NEIGHBORS[blank]:
+                s = swap(state, blank, j)
+                nodes_opened += 1
+                if pdb[lehmer_index(s)] == dist - 1:
+                    break
+            path.append(s)
+            state, blank, dist = s, j, dist - 1
+        return path, nodes_opened
+
+
+_stop_event = None
+
+
+def _init_window_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+
+def _window_search(job):
+    puzzle, bound, max_depth, deadline = job
+    if _stop_event.is_set():
+        return None, 0
+    path = [puzzle.initial]
+    _, found, nodes_opened = puzzle.search(path, puzzle.h_additive(puzzle.initial), bound, max_depth,
+                                           deadline, [0] * (1 << TT_BITS), 0, _stop_event)
+    return path if found else None, nodes_opened
+
+def warm_goal_tables(goal, method):
+    # Build the cached tables up front, so no case's Computing Time includes them
+    additive_pattern_database(goal)
+    if method == 'ida_star_pdb':
+        pattern_database(goal)
+    elif method == 'ida_star_bidir':
+        perimeter_around(goal, PERIMETER_RADIUS)
+
+
+def solve_puzzle(start_state, goal_state, method='ida_star'):
+    # method names one of Puzzle's IDA* variants; all of them return (path, nodes_opened)
+    start_time = time.perf_counter_ns()
     puzzle = Puzzle(start_state, goal_state)
-    solution_path, nodes_opened = puzzle.ida_star()
-    end_time = time.time()
+    solution_path, nodes_opened = getattr(puzzle, method)()
+    end_time = time.perf_counter_ns()
 
     solution = solution_path is not None
     moves = len(solution_path) - 1 if solution else 0
-    time_taken = end_time - start_time
+    time_taken = (end_time - start_time) / 1e9
 
     return (start_state, solution, moves, nodes_opened, time_taken)
 
 def generate_start_states(seed, num_states=10):
-    template_state = list(range(8, -1, -1))
-    random.seed(seed)
+    # A private generator gives the same sequence as seeding the global one, without touching it
+    rng = random.Random(seed)
     start_states = []
     for _ in range(num_states):
-        shuffled_state = template_state[:]
-        random.shuffle(shuffled_state)
+        shuffled_state = list(range(8, -1, -1))
+        rng.shuffle(shuffled_state)
         grid = [shuffled_state[i:i+3] for i in range(0, 9, 3)]
-        blank_pos = next((r, c) for r, row in enumerate(grid) for c, val in enumerate(row) if val == 0)
-        start_states.append([*blank_pos, grid])
+        start_states.append([*divmod(shuffled_state.index(0), 3), grid])
     return start_states
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--method', default='ida_star',
+                        choices=['ida_star', 'ida_star_parallel', 'ida_star_bidir', 'ida_star_pdb'])
+    args = parser.parse_args()
     seed = 123  # Replace with the last three digits of your student registration number
     goal_state = [1, 1, [[1, 2, 3], [8, 0, 4], [7, 6, 5]]]
     start_states = generate_start_states(seed)
 
-    with open('IDAstar_output.csv', 'w', newline='') as csvfile:
+    methods = itertools.repeat(args.method)
+    warm_args = (pack(goal_state[2]), args.method)
+    if args.method == 'ida_star_parallel':
+        # Each case already spreads its bound windows over every core, so the cases run in turn
+        warm_goal_tables(*warm_args)
+        results = list(map(solve_puzzle, start_states, itertools.repeat(goal_state), methods))
+    else:
+        # Each case is an independent search, so they run in separate processes; map keeps case order
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=warm_goal_tables,
+                                 initargs=warm_args) as executor:
+            results = list(executor.map(solve_puzzle, start_states, itertools.repeat(goal_state), methods))
+    rows = [{
+        'Case Number': i,
+        # Tiles read row by row, e.g. 173265048, the same format IDDFS writes
+        'Start State': ''.join(str(val) for row in result[0][2] for val in row),
+        'Solution Found': 1 if result[1] else 0,
+        'Number of Moves': result[2],
+        'Nodes Opened': result[3],
+        'Computing Time': result[4]
+    } for i, result in enumerate(results, 1)]
+
+    # Rows are written in one batch once every case is done
+    with open('IDAstar_output.csv', 'w', newline='', buffering=1 << 20) as csvfile:
         fieldnames = ['Case Number', 'Start State', 'Solution Found', 'Number of Moves', 'Nodes Opened', 'Computing Time']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
-
-        for i, start_state in enumerate(start_states, 1):
-            result = solve_puzzle(start_state, goal_state)
-            writer.writerow({
-                'Case Number': i,
-                'Start State': str(result[0]),
-                'Solution Found': 1 if result[1] else 0,
-                'Number of Moves': result[2],
-                'Nodes Opened': result[3],
-                'Computing Time': result[4]
-            })
+        writer.writerows(rows)
 
 if __name__ == "__main__":
     main()
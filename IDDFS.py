@@ -1,85 +1,122 @@
-import copy
 import itertools
-import random
+import os
 import csv
 import time
+from concurrent.futures import ProcessPoolExecutor
 
-# Set the random seed for reproducibility
-random.seed(123)  # Adjust the seed as needed
+from IDAstar import generate_start_states, is_solvable
 
 
-def move(state):
-    [i, j, grid] = state
-    n = len(grid)
-    for pos in move_blank(i, j, n):
-        i1, j1 = pos
-        new_grid = copy.deepcopy(grid)
-        new_grid[i][j], new_grid[i1][j1] = new_grid[i1][j1], new_grid[i][j]
-        yield [i1, j1, new_grid]
+# Cells are numbered 0..8 row by row; NEIGHBORS[i] lists the cells the blank can move to from cell i
+NEIGHBORS = ((1, 3), (0, 2, 4), (1, 5), (0, 4, 6), (1, 3, 5, 7), (2, 4, 8), (3, 7), (4, 6, 8), (5, 7))
+BOARD_MASK = (1 << 36) - 1
 
 
-def move_blank(i, j, n):
-    if i + 1 < n:
-        yield (i + 1, j)
-    if i - 1 >= 0:
-        yield (i - 1, j)
-    if j + 1 < n:
-        yield (i, j + 1)
-    if j - 1 >= 0:
-        yield (i, j - 1)
+def pack(state):
+    # [i, j, grid] -> one int: tile in cell k at bits 4*k..4*k+3, blank cell index at bits 36..39
+    i, j, grid = state
+    return sum(val << (4 * k) for k, val in enumerate(val for row in grid for val in row)) | (3 * i + j) << 36
 
 
-def generate_random_start_state(template, n):
-    start_states = []
-    for _ in range(n):
-        shuffled = template[:]
-        random.shuffle(shuffled)
-        state = [shuffled.index(0) // 3, shuffled.index(0) % 3, [shuffled[i:i + 3] for i in range(0, 9, 3)]]
-        start_states.append(state)
-    return start_states
+def move(state, last_blank=-1):
+    # last_blank: where the blank just came from; moving it straight back would undo that move
+    blank = state >> 36
+    board = state & BOARD_MASK
+    for j in NEIGHBORS[blank]:
+        if j == last_blank:
+            continue
+        val = (board >> (4 * j)) & 0xF
+        yield board ^ (val << (4 * j)) ^ (val << (4 * blank)) | j << 36
 
 
 def solve_puzzle(start_state, goal_state):
     max_depth = 30
-
-    def dfs(node, depth, nodes_opened):
-        if depth == 0:
+    goal = pack(goal_state)
+    # Backward side: breadth-first layers grown from the goal, state -> next state towards the goal
+    backward = {goal: None}
+    layer = [goal]
+    radius = 0
+
+    def dfs(root, depth, nodes_opened):
+        # Depth-limited search over at most depth - 1 moves from root, with an explicit stack instead
+        # of recursion: path[k] is the state k moves in and children[k] yields its untried moves.
+        # seen maps each state expanded in this pass to the fewest moves it was reached with; reaching
+        # it again with no fewer moves cannot get further, so it is skipped (this also skips cycles)
+        if root in backward:
+            return [root], nodes_opened
+        if depth == 1:
             return None, nodes_opened
-        if node[2] == goal_state[2]:
-            return [node], nodes_opened
-        for next_state in move(node):
+        path = [root]
+        seen = {root: 0}
+        children = [move(root)]
+        while children:
+            next_state = next(children[-1], None)
+            if next_state is None:
+                children.pop()
+                path.pop()
+                continue
+            moves = len(path)
+            if seen.get(next_state, depth) <= moves:
+                continue
             nodes_opened += 1
-            result, nodes_opened = dfs(next_state, depth - 1, nodes_opened)
-            if result is not None:
-                return [node] + result, nodes_opened
+            if next_state in backward:
+                path.append(next_state)
+                return path, nodes_opened
+            if moves < depth - 1:
+                # The blank's previous cell is excluded: moving it back would undo this move
+                children.append(move(next_state, path[-1] >> 36))
+                path.append(next_state)
+                seen[next_state] = moves
         return None, nodes_opened
 
+    # Bidirectional iterative deepening: a limit of `depth` levels allows depth - 1 moves, split into
+    # (depth - 1) // 2 backward moves, held in `backward`, and the rest searched forward until a state
+    # in `backward` is reached. Both halves only grow with depth, so the first meeting is a shortest path.
+    # perf_counter_ns: monotonic, and fine-grained enough for the sub-millisecond cases
+    start_time = time.perf_counter_ns()
+    nodes_opened = 0
+    root = pack(start_state)
+    if not is_solvable(root, goal):
+        return start_state, 0, 0, nodes_opened, (time.perf_counter_ns() - start_time) / 1e9
     for depth in itertools.count(start=1):
-        nodes_opened = 0
-        start_time = time.time()
-        result, nodes_opened = dfs(start_state, depth, nodes_opened)
-        end_time = time.time()
+        while radius < (depth - 1) // 2:
+            next_layer = []
+            for state in layer:
+                for next_state in move(state):
+                    if next_state not in backward:
+                        nodes_opened += 1
+                        backward[next_state] = state
+                        next_layer.append(next_state)
+            layer = next_layer
+            radius += 1
+        result, nodes_opened = dfs(root, depth - radius, nodes_opened)
         if result or depth == max_depth:
+            if result:
+                while backward[result[-1]] is not None:
+                    result.append(backward[result[-1]])
             solution_found = 1 if result else 0
             number_of_moves = len(result) - 1 if result else 0
-            computing_time = end_time - start_time
+            computing_time = (time.perf_counter_ns() - start_time) / 1e9
             return start_state, solution_found, number_of_moves, nodes_opened, computing_time
 
 
 def main():
-    template = [8, 7, 6, 5, 4, 3, 2, 1, 0]
+    seed = 123  # Adjust the seed as needed
     goal_state = [1, 1, [[1, 2, 3], [8, 0, 4], [7, 6, 5]]]
-    start_states = generate_random_start_state(template, 10)
+    start_states = generate_start_states(seed)
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(solve_puzzle, start_states, itertools.repeat(goal_state))
+        # Case number, the start board read row by row, then the rest of solve_puzzle's result as is
+        rows = [[i, ''.join(str(val) for row in result[0][2] for val in row), *result[1:]]
+                for i, result in enumerate(results, start=1)]
 
-    with open('IDDFS_output.csv', 'w', newline='') as file:
+    with open('IDDFS_output.csv', 'w', newline='', buffering=1 << 20) as file:
         writer = csv.writer(file)
         writer.writerow(
             ['Case number', 'Case start state', 'Solution found', 'Number of moves', 'Number of nodes opened',
              'Computing time'])
-
-        for i, start_state in enumerate(start_states, start=1):
-            _, solution_found, number_of_moves, nodes_opened, computing_time = solve_puzzle(start_state, goal_state)
-            writer.writerow([i, str(start_state[2]), solution_found, number_of_moves, nodes_opened, computing_time])
+        writer.writerows(rows)
 
 
 if __name__ == "__main__":